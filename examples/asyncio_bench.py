@@ -0,0 +1,68 @@
+import asyncio
+import statistics
+import sys
+import time
+
+from simple_event.asyncio_loop import EventSetLoop
+
+MESSAGE = b'x' * 99 + b'\n'
+
+async def echo(reader, writer):
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        writer.write(line)
+        await writer.drain()
+    writer.close()
+
+async def client(port, count):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    for _ in range(count):
+        writer.write(MESSAGE)
+        await reader.readline()
+    writer.close()
+    await writer.wait_closed()
+
+async def bench(clients, count):
+    server = await asyncio.start_server(echo, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, count) for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    return clients * count / elapsed
+
+def run(factory, clients, count):
+    loop = factory()
+    try:
+        return loop.run_until_complete(bench(clients, count))
+    finally:
+        loop.close()
+
+def main():
+    if len(sys.argv) > 4:
+        sys.exit('Usage: asyncio_bench.py [clients] [messages] [rounds]')
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    loops = [
+            ('selector', asyncio.SelectorEventLoop),
+            ('EventSet', EventSetLoop),
+    ]
+    # warm up, so neither loop pays for a cold process
+    for name, factory in loops:
+        run(factory, clients, count)
+    rates = {name: [] for name, factory in loops}
+    for i in range(rounds):
+        # alternate which loop goes first
+        for name, factory in loops[::-1] if i % 2 else loops:
+            rates[name].append(run(factory, clients, count))
+    for name, factory in loops:
+        r = sorted(rates[name])
+        print('%-10s median %9.0f  best %9.0f round trips/s'
+                % (name, statistics.median(r), r[-1]))
+
+if __name__ == '__main__':
+    main()
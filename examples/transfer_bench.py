@@ -0,0 +1,93 @@
+import errno
+import os
+import socket
+import sys
+import tempfile
+import time
+
+from simple_event import constants
+from simple_event.event_set import EventSet
+from simple_event.transfer import FileSender, proxy
+
+class Sink:
+    def __init__(self):
+        self.buffer = bytearray(constants.TRANSFER_SIZE)
+        self.total = 0
+
+    def reader(self, evs, fd):
+        while True:
+            try:
+                n = fd.recv_into(self.buffer)
+            except socket.error as e:
+                if e.errno == errno.EAGAIN:
+                    return constants.CALLBACK_PRESERVE
+                raise
+            else:
+                if not n:
+                    return constants.CALLBACK_REMOVE
+                self.total += n
+
+class CopySender:
+    ''' What you'd do without transfer.py: read it all in, then send.
+    '''
+    def __init__(self, f):
+        f.seek(0)
+        self.buffer = memoryview(f.read())
+
+    def writer(self, evs, fd):
+        while self.buffer:
+            try:
+                n = fd.send(self.buffer)
+            except socket.error as e:
+                if e.errno == errno.EAGAIN:
+                    return constants.CALLBACK_PRESERVE
+                raise
+            else:
+                self.buffer = self.buffer[n:]
+        return constants.CALLBACK_REMOVE
+
+def tcp_pair():
+    lfd = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    lfd.bind(('127.0.0.1', 0))
+    lfd.listen(1)
+    a = socket.create_connection(lfd.getsockname())
+    b, _ = lfd.accept()
+    lfd.close()
+    a.setblocking(False)
+    b.setblocking(False)
+    return a, b
+
+def bench(name, f, size, make_sender, use_proxy=None):
+    evs = EventSet()
+    src, dst = tcp_pair()
+    sink = Sink()
+    start = time.perf_counter()
+    evs.on_writable(src, make_sender(f).writer)
+    if use_proxy is not None:
+        mid, out = tcp_pair()
+        proxy(evs, dst, mid, use_proxy)
+        dst = out
+    evs.on_readable(dst, sink.reader)
+    evs.run_forever()
+    elapsed = time.perf_counter() - start
+    assert sink.total == size
+    print('%-16s %6.2f GB/s' % (name, size / elapsed / 1e9))
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit('Usage: transfer_bench.py [megabytes]')
+    size = int(sys.argv[1] if len(sys.argv) == 2 else 256) * 1024 * 1024
+    with tempfile.TemporaryFile() as f:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(size // len(chunk)):
+            f.write(chunk)
+        f.flush()
+
+        bench('copy', f, size, CopySender)
+        bench('mmap', f, size, lambda f: FileSender(f, use_sendfile=False))
+        bench('sendfile', f, size, FileSender)
+        bench('proxy copy', f, size, FileSender, False)
+        bench('proxy splice', f, size, FileSender, True)
+
+if __name__ == '__main__':
+    main()
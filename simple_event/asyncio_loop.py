@@ -0,0 +1,257 @@
+# Copyright © 2013, Ben Longbons <b.r.longbons@gmail.com>
+
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+''' Run asyncio code on top of an EventSet.
+
+    Usage:
+        asyncio.set_event_loop_policy(EventSetLoopPolicy())
+        asyncio.run(main())
+
+    asyncio keeps its own ready queue for call_soon(), but add_reader()
+    and friends become on_readable()/on_writable().
+
+    call_later() and call_at() go on a timer queue next to the EventSet,
+    not in it: asyncio times are time.monotonic(), while the EventSet's
+    are UTC wall-clock times, which would make every asyncio timeout
+    fire early or stall whenever the clock is set. EventSet timers still
+    work, and are polled in the same select().
+'''
+
+import asyncio
+import datetime
+import os
+import selectors
+import time
+
+from .event_set import EventSet
+from .priority_queue import PriorityQueue
+from .sock_ev import fileno
+from . import constants
+
+READ_WRITE = selectors.EVENT_READ | selectors.EVENT_WRITE
+
+# asyncio's loop.time() is time.monotonic()
+CLOCK_RESOLUTION = time.get_clock_info('monotonic').resolution
+# same as asyncio: purge cancelled timers when they are over half
+MIN_PURGE = 100
+
+def _fd(fileobj):
+    try:
+        fd = fileno(fileobj)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError('Invalid file object: %r' % (fileobj,)) from None
+    if fd < 0:
+        raise ValueError('Invalid file descriptor: %r' % (fd,))
+    return fd
+
+def _check_events(events):
+    if not events or events & ~READ_WRITE:
+        raise ValueError('Invalid events: %r' % (events,))
+
+class EventSetSelector(selectors.BaseSelector):
+    ''' Just enough of a selector for asyncio's SelectorEventLoop.
+
+        The EventSet closes fds it loses interest in, but asyncio wants
+        to keep its own, so every registered fd is dup()ed first. This
+        means each registered fd costs two, so RLIMIT_NOFILE runs out
+        at half as many connections as with the stock selectors.
+    '''
+
+    def __init__(self, evs=None, add_callback=None):
+        ''' add_callback is called with each TimerHandle from call_at()
+            once it is due, i.e. the loop's _add_callback().
+        '''
+        self._own_evs = evs is None
+        if evs is None:
+            evs = EventSet()
+        self._evs = evs
+        self._add_callback = add_callback
+        self._keys = {}
+        self._dups = {}
+        self._events = {}
+        self._timers = PriorityQueue()
+        self._cancelled = 0
+
+    def _lookup(self, fileobj):
+        try:
+            fd = _fd(fileobj)
+        except ValueError:
+            # a socket that was closed before it was unregistered
+            for key in self._keys.values():
+                if key.fileobj is fileobj:
+                    return key.fd
+            raise
+        if fd not in self._keys:
+            raise KeyError('%r is not registered' % (fileobj,))
+        return fd
+
+    def _on(self, fd, events):
+        dup = self._dups[fd]
+        if events & selectors.EVENT_READ:
+            self._evs.on_readable(dup,
+                    lambda evs, dup: self._fire(fd, selectors.EVENT_READ))
+        if events & selectors.EVENT_WRITE:
+            self._evs.on_writable(dup,
+                    lambda evs, dup: self._fire(fd, selectors.EVENT_WRITE))
+
+    def _off(self, fd, events):
+        dup = self._dups[fd]
+        if events & selectors.EVENT_READ:
+            self._evs.off_readable(dup)
+        if events & selectors.EVENT_WRITE:
+            self._evs.off_writable(dup)
+
+    def _fire(self, fd, event):
+        if fd in self._keys:
+            self._events[fd] = self._events.get(fd, 0) | event
+        return constants.CALLBACK_PRESERVE
+
+    def register(self, fileobj, events, data=None):
+        _check_events(events)
+        fd = _fd(fileobj)
+        if fd in self._keys:
+            raise KeyError('%r (FD %d) is already registered' % (fileobj, fd))
+        dup = os.dup(fd)
+        key = selectors.SelectorKey(fileobj, fd, events, data)
+        self._keys[fd] = key
+        self._dups[fd] = dup
+        self._on(fd, events)
+        return key
+
+    def unregister(self, fileobj):
+        fd = self._lookup(fileobj)
+        key = self._keys[fd]
+        # the last of these closes the dup
+        self._off(fd, key.events)
+        del self._keys[fd]
+        del self._dups[fd]
+        self._events.pop(fd, None)
+        return key
+
+    def modify(self, fileobj, events, data=None):
+        _check_events(events)
+        fd = self._lookup(fileobj)
+        old = self._keys[fd]
+        # add before removing, so the dup stays open
+        self._on(fd, events & ~old.events)
+        self._off(fd, old.events & ~events)
+        key = old._replace(events=events, data=data)
+        self._keys[fd] = key
+        return key
+
+    def call_at(self, handle):
+        ''' Schedule an asyncio.TimerHandle for handle.when().
+        '''
+        handle._scheduled = True
+        self._timers.push(handle.when(), handle)
+
+    def timer_cancelled(self, handle):
+        if handle._scheduled:
+            self._cancelled += 1
+
+    def _purge(self):
+        if self._cancelled > MIN_PURGE \
+                and self._cancelled * 2 > len(self._timers):
+            self._timers.prune(lambda handle: handle.cancelled())
+            self._cancelled = 0
+        while self._timers and self._timers.peek().value.cancelled():
+            self._timers.pop().value._scheduled = False
+            self._cancelled -= 1
+
+    def _fire_timers(self):
+        ''' Fire all due timers, returning how many there were.
+        '''
+        self._purge()
+        now = time.monotonic() + CLOCK_RESOLUTION
+        n = 0
+        while self._timers.has(now):
+            handle = self._timers.pop().value
+            handle._scheduled = False
+            if handle.cancelled():
+                self._cancelled -= 1
+                continue
+            self._add_callback(handle)
+            n += 1
+        return n
+
+    def select(self, timeout=None):
+        delta = self._evs.poll_timers()
+        if self._fire_timers():
+            timeout = 0
+        elif self._timers:
+            when = max(self._timers.peek().key - time.monotonic(), 0)
+            if timeout is None or when < timeout:
+                timeout = when
+        if timeout is not None:
+            timeout = datetime.timedelta(seconds=max(timeout, 0))
+            if delta is None or timeout < delta:
+                delta = timeout
+        self._evs.poll_fds(delta)
+        self._evs.poll_timers()
+        self._fire_timers()
+
+        ready = []
+        for fd, mask in self._events.items():
+            key = self._keys.get(fd)
+            if key is not None and mask & key.events:
+                ready.append((key, mask & key.events))
+        self._events = {}
+        return ready
+
+    def close(self):
+        # not by fileobj, which may have been closed already
+        for fd, key in self._keys.items():
+            self._off(fd, key.events)
+        self._keys.clear()
+        self._dups.clear()
+        self._events.clear()
+        self._timers = PriorityQueue()
+        self._cancelled = 0
+        if self._own_evs:
+            self._evs.close()
+
+    def get_key(self, fileobj):
+        return self._keys[self._lookup(fileobj)]
+
+    def get_map(self):
+        return {key.fileobj: key for key in self._keys.values()}
+
+class EventSetLoop(asyncio.SelectorEventLoop):
+    ''' An asyncio event loop that runs on an EventSet.
+
+        Everything asyncio needs for sockets, servers, streams, signals
+        and subprocesses comes from SelectorEventLoop.
+    '''
+
+    def __init__(self, evs=None):
+        super().__init__(EventSetSelector(evs, self._add_callback))
+
+    def call_at(self, when, callback, *args, context=None):
+        self._check_closed()
+        if self._debug:
+            self._check_thread()
+            self._check_callback(callback, 'call_at')
+        timer = asyncio.TimerHandle(when, callback, args, self, context)
+        if timer._source_traceback:
+            del timer._source_traceback[-1]
+        self._selector.call_at(timer)
+        return timer
+
+    def _timer_handle_cancelled(self, handle):
+        self._selector.timer_cancelled(handle)
+
+class EventSetLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    ''' Install with asyncio.set_event_loop_policy(EventSetLoopPolicy()).
+    '''
+    _loop_factory = EventSetLoop
@@ -13,6 +13,8 @@
 # OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
 
 BUFFER_SIZE = 4096
+# one pipe's worth on linux, for zero-copy transfers
+TRANSFER_SIZE = 65536
 
 class Enum:
     def __init__(self, s):
@@ -26,9 +26,10 @@ class EventSet:
         Note: there is no way to iterate over the list of fds. After all,
         some fds may be used internally, or appear/disappear unpredictably.
 
-        Note: the ONLY way to express disinterest in an fd is
-        if the callback returns CALLBACK_REMOVE. But you can set a new
-        callback if you really need to, and call shutdown() to force it.
+        Note: the usual way to express disinterest in an fd is
+        if the callback returns CALLBACK_REMOVE. Otherwise, you can
+        use off_readable() or off_writable(). Either way, the fd is
+        closed once there is no interest left in it.
 
         Note: all datetimes are in UTC.
     '''
@@ -117,6 +118,24 @@ class EventSet:
         if self._magic is not None: # poll vs timer
             self._magic.add(fd)
 
+    def off_readable(self, fd):
+        ''' Forget the can-read event on the socket, exactly as if
+            its callback had returned CALLBACK_REMOVE.
+
+            This may be called from any callback, even the fd's own.
+        '''
+        self._poll.off_read(fd, fd in self._write)
+        del self._read[fd]
+
+    def off_writable(self, fd):
+        ''' Forget the can-write event on the socket, exactly as if
+            its callback had returned CALLBACK_REMOVE.
+
+            This may be called from any callback, even the fd's own.
+        '''
+        self._poll.off_write(fd, fd in self._read)
+        del self._write[fd]
+
     def poll_fds(self, timeout):
         ''' Check all sockets for events and execute their callbacks.
 
@@ -131,28 +150,40 @@ class EventSet:
         self._magic = set()
 
         for fd in r:
-            callback = self._read[fd]
+            callback = self._read.get(fd)
+            if callback is None: # off_readable() by an earlier callback
+                continue
             status = callback(self, fd)
             if status is constants.CALLBACK_PRESERVE: # typical
                 # note: the callback *may* have been changed. I don't care.
                 continue
             assert status is constants.CALLBACK_REMOVE
-            self._poll.off_read(fd, fd in self._write)
-            del self._read[fd]
+            if fd in self._read:
+                self.off_readable(fd)
 
         w.update(self._magic) # must accept spurious
 
         for fd in w:
-            callback = self._write[fd]
+            callback = self._write.get(fd)
+            if callback is None: # off_writable() by an earlier callback
+                continue
             status = callback(self, fd)
             if status is constants.CALLBACK_REMOVE: # typical
-                self._poll.off_write(fd, fd in self._read)
-                del self._write[fd]
+                if fd in self._write:
+                    self.off_writable(fd)
                 continue
             assert status is constants.CALLBACK_PRESERVE
 
         self._magic = None
 
+    def close(self):
+        ''' Release the poller's own resources.
+
+            Any fds that are still registered are NOT closed, and the
+            EventSet must not be used afterwards.
+        '''
+        self._poll.close()
+
     def run_forever(self):
         ''' Run until there is nothing to be done.
 
@@ -56,6 +56,9 @@ class PriorityQueue:
     def __bool__(self):
         return bool(self._heap)
 
+    def __len__(self):
+        return len(self._heap)
+
     def push(self, key, value):
         heapq.heappush(self._heap, Entry(key, value))
 
@@ -70,3 +73,9 @@ class PriorityQueue:
 
     def has(self, key):
         return self and self.peek().key <= key
+
+    def prune(self, pred):
+        ''' Remove every entry whose value matches pred.
+        '''
+        self._heap = [e for e in self._heap if not pred(e.value)]
+        heapq.heapify(self._heap)
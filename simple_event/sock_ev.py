@@ -83,6 +83,11 @@ class EpollImpl:
             del self._map[fileno(fd)]
             close(fd)
 
+    def close(self):
+        ''' Release the epoll fd. The fds in it are left alone.
+        '''
+        self._impl.close()
+
     def check(self, timeout):
         ''' return a tuple (r, w) of sets of fds ready for IO.
         '''
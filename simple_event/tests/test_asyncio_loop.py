@@ -0,0 +1,205 @@
+# Copyright © 2013, Ben Longbons <b.r.longbons@gmail.com>
+
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+import unittest
+
+import asyncio
+import datetime
+import os
+import resource
+import selectors
+import socket
+
+from simple_event.asyncio_loop import EventSetLoop, EventSetLoopPolicy
+from simple_event.asyncio_loop import EventSetSelector, MIN_PURGE
+from simple_event.event_set import EventSet
+from simple_event import constants
+
+class TestEventSetLoop(unittest.TestCase):
+    def setUp(self):
+        self.loop = EventSetLoop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_call_soon(self):
+        order = []
+        self.loop.call_soon(order.append, 1)
+        self.loop.call_soon(order.append, 2)
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        assert order == [1, 2]
+
+    def test_call_later(self):
+        order = []
+        self.loop.call_later(0.02, order.append, 2)
+        self.loop.call_later(0.01, order.append, 1)
+        self.loop.call_later(0.01, order.append, 'cancelled').cancel()
+        self.loop.call_later(0.03, self.loop.stop)
+        start = self.loop.time()
+        self.loop.run_forever()
+        assert self.loop.time() - start >= 0.03
+        assert order == [1, 2]
+
+    def test_reader(self):
+        r, w = os.pipe()
+        data = b'Test message for reading.\n\0\x86Random garbage.'
+        def callback():
+            assert os.read(r, constants.BUFFER_SIZE) == data
+            self.loop.remove_reader(r)
+            self.loop.stop()
+        self.loop.add_reader(r, callback)
+        os.write(w, data)
+        self.loop.run_forever()
+        # the loop must not have closed it
+        os.write(w, data)
+        assert os.read(r, constants.BUFFER_SIZE) == data
+        os.close(r)
+        os.close(w)
+
+    def test_writer(self):
+        r, w = os.pipe()
+        data = b'Test message for writing.\n\0\x86Random garbage.'
+        def callback():
+            assert os.write(w, data) == len(data)
+            self.loop.remove_writer(w)
+            self.loop.stop()
+        self.loop.add_writer(w, callback)
+        self.loop.run_forever()
+        assert os.read(r, constants.BUFFER_SIZE) == data
+        os.close(r)
+        os.close(w)
+
+    def test_closed_before_remove(self):
+        a, b = socket.socketpair()
+        b.settimeout(1)
+        self.loop.add_reader(a, lambda: None)
+        a.close()
+        assert self.loop.remove_reader(a)
+        # the dup is gone too
+        assert b.recv(constants.BUFFER_SIZE) == b''
+        b.close()
+
+    def test_closed_before_close(self):
+        a, b = socket.socketpair()
+        b.settimeout(1)
+        self.loop.add_reader(a, lambda: None)
+        self.loop.add_writer(a, lambda: None)
+        a.close()
+        self.loop.close()
+        assert b.recv(constants.BUFFER_SIZE) == b''
+        b.close()
+
+    def test_wait_for(self):
+        async def forever():
+            await asyncio.sleep(3600)
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(asyncio.wait_for(forever(), 0.01))
+
+    def test_cancelled_timers(self):
+        async def quick():
+            pass
+        async def main():
+            for _ in range(20 * MIN_PURGE):
+                await asyncio.wait_for(quick(), 3600)
+        # keeps the cancelled ones from being popped off the front
+        self.loop.call_later(1800, lambda: None)
+        self.loop.run_until_complete(main())
+        assert len(self.loop._selector._timers) <= 2 * MIN_PURGE + 2
+
+    def test_close_timers(self):
+        self.loop.call_later(3600, lambda: None)
+        self.loop.call_later(3600, lambda: None).cancel()
+        selector = self.loop._selector
+        self.loop.close()
+        assert not selector._timers
+
+    def test_event_set_timer(self):
+        evs = EventSet()
+        loop = EventSetLoop(evs)
+        self.fired = False
+        def callback(evs, when):
+            self.fired = True
+            loop.stop()
+        evs.on_timer(datetime.timedelta(seconds=0.01), callback)
+        loop.run_forever()
+        loop.close()
+        assert self.fired
+        del self.fired
+
+    def test_streams(self):
+        data = b'Test message for echoing.\n'
+        async def echo(reader, writer):
+            writer.write(await reader.readline())
+            await writer.drain()
+            writer.close()
+        async def main():
+            server = await asyncio.start_server(echo, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(data)
+            assert await reader.read() == data
+            writer.close()
+            await writer.wait_closed()
+            server.close()
+            await server.wait_closed()
+        self.loop.run_until_complete(main())
+
+class TestEventSetSelector(unittest.TestCase):
+    def test_register_emfile(self):
+        selector = EventSetSelector()
+        r, w = os.pipe()
+        lowest = os.dup(r)
+        os.close(lowest)
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        # no room for the dup
+        resource.setrlimit(resource.RLIMIT_NOFILE, (lowest, hard))
+        try:
+            with self.assertRaises(OSError):
+                selector.register(r, selectors.EVENT_READ)
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+        with self.assertRaises(KeyError):
+            selector.get_key(r)
+        selector.register(r, selectors.EVENT_READ)
+        selector.unregister(r)
+        selector.close()
+        os.close(r)
+        os.close(w)
+
+    def test_close(self):
+        evs = EventSet()
+        EventSetSelector(evs).close()
+        # not ours to close
+        evs.on_timer(datetime.timedelta(0), lambda evs, when: None)
+        evs.poll_fds(datetime.timedelta(0))
+        evs.close()
+
+        selector = EventSetSelector()
+        selector.close()
+        with self.assertRaises(ValueError):
+            selector._evs.poll_fds(datetime.timedelta(0))
+
+class TestEventSetLoopPolicy(unittest.TestCase):
+    def test_policy(self):
+        old = asyncio.get_event_loop_policy()
+        asyncio.set_event_loop_policy(EventSetLoopPolicy())
+        try:
+            async def main():
+                return asyncio.get_running_loop()
+            assert isinstance(asyncio.run(main()), EventSetLoop)
+        finally:
+            asyncio.set_event_loop_policy(old)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -103,5 +103,78 @@ class TestEventSet(unittest.TestCase):
         assert buf == data
         r.close() # never passed off to the EvS
 
+    def test_off_other(self):
+        evs = EventSet()
+        a, a_w = socket.socketpair()
+        b, b_w = socket.socketpair()
+        a_w.send(b'a')
+        b_w.send(b'b')
+        self.called = []
+        # whichever runs first removes the other, in the same poll_fds()
+        def callback_a(evs, fd):
+            self.called.append(fd)
+            evs.off_readable(b)
+            return constants.CALLBACK_REMOVE
+        def callback_b(evs, fd):
+            self.called.append(fd)
+            evs.off_readable(a)
+            return constants.CALLBACK_REMOVE
+        evs.on_readable(a, callback_a)
+        evs.on_readable(b, callback_b)
+        evs.poll_fds(datetime.timedelta(0))
+        assert len(self.called) == 1
+        assert a.fileno() == -1
+        assert b.fileno() == -1
+        del self.called
+        a_w.close()
+        b_w.close()
+
+    def test_off_self(self):
+        evs = EventSet()
+        r, w = socket.socketpair()
+        w.send(b'x')
+        def callback(evs, fd):
+            evs.off_readable(fd)
+            return constants.CALLBACK_REMOVE
+        evs.on_readable(r, callback)
+        evs.run_forever()
+        assert r.fileno() == -1
+
+        r, w2 = socket.socketpair()
+        def callback(evs, fd):
+            evs.off_writable(fd)
+            return constants.CALLBACK_PRESERVE
+        evs.on_writable(w2, callback)
+        evs.run_forever()
+        assert w2.fileno() == -1
+        w.close()
+        r.close()
+
+    def test_off_close(self):
+        evs = EventSet()
+        s, other = socket.socketpair()
+        evs.on_readable(s, lambda evs, fd: constants.CALLBACK_PRESERVE)
+        evs.on_writable(s, lambda evs, fd: constants.CALLBACK_PRESERVE)
+        evs.off_readable(s)
+        assert s.fileno() != -1
+        evs.on_readable(s, lambda evs, fd: constants.CALLBACK_PRESERVE)
+        evs.off_writable(s)
+        assert s.fileno() != -1
+        evs.off_readable(s)
+        assert s.fileno() == -1
+        evs.run_forever()
+        other.close()
+
+    def test_close(self):
+        evs = EventSet()
+        r, w = os.pipe()
+        evs.on_readable(r, lambda evs, fd: constants.CALLBACK_PRESERVE)
+        evs.close()
+        # still open
+        assert os.write(w, b'x') == 1
+        assert os.read(r, constants.BUFFER_SIZE) == b'x'
+        os.close(r)
+        os.close(w)
+
 if __name__ == '__main__':
     unittest.main()
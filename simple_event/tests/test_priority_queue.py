@@ -72,5 +72,20 @@ class TestPriorityQueue(unittest.TestCase):
         assert pq.has(1)
         assert pq.has(2)
 
+    def test_len(self):
+        pq = PriorityQueue()
+        assert len(pq) == 0
+        pq.push(1, None)
+        pq.push(1, None)
+        assert len(pq) == 2
+
+    def test_prune(self):
+        pq = PriorityQueue()
+        for i in range(10):
+            pq.push(i, i)
+        pq.prune(lambda v: v % 2)
+        assert len(pq) == 5
+        assert [pq.pop().value for _ in range(5)] == [0, 2, 4, 6, 8]
+
 if __name__ == '__main__':
     unittest.main()
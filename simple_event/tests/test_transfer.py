@@ -0,0 +1,256 @@
+# Copyright © 2013, Ben Longbons <b.r.longbons@gmail.com>
+
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+import unittest
+
+import datetime
+import errno
+import os
+import socket
+import struct
+import tempfile
+
+from simple_event.event_set import EventSet
+from simple_event.transfer import FileSender, Pump, proxy
+from simple_event.transfer import HAVE_SENDFILE, HAVE_SPLICE
+from simple_event import constants
+
+# big enough to not fit in a socket buffer
+DATA = os.urandom(3 * 1024 * 1024 + 17)
+
+class Collector:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def reader(self, evs, fd):
+        while True:
+            try:
+                buf = fd.recv(constants.TRANSFER_SIZE)
+            except socket.error as e:
+                if e.errno == errno.EAGAIN:
+                    return constants.CALLBACK_PRESERVE
+                raise
+            if not buf:
+                return constants.CALLBACK_REMOVE
+            self.buffer += buf
+
+class Quitter(Collector):
+    ''' Hang up after the first read.
+    '''
+    def reader(self, evs, fd):
+        self.buffer += fd.recv(constants.TRANSFER_SIZE)
+        return constants.CALLBACK_REMOVE
+
+class Server(Collector):
+    ''' Read a whole request, then send the response and close.
+    '''
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+    def reader(self, evs, fd):
+        status = super().reader(evs, fd)
+        if status is constants.CALLBACK_REMOVE:
+            evs.on_writable(fd, self.writer)
+        return status
+
+    def writer(self, evs, fd):
+        fd.sendall(self.response)
+        return constants.CALLBACK_REMOVE
+
+class CountingPump(Pump):
+    __slots__ = ('calls',)
+
+    def reader(self, evs, fd):
+        self.calls += 1
+        return super().reader(evs, fd)
+
+def nonblocking_pair():
+    r, w = socket.socketpair()
+    r.setblocking(False)
+    w.setblocking(False)
+    return r, w
+
+def tcp_pair():
+    lfd = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    lfd.bind(('127.0.0.1', 0))
+    lfd.listen(1)
+    a = socket.create_connection(lfd.getsockname())
+    b, _ = lfd.accept()
+    lfd.close()
+    a.setblocking(False)
+    b.setblocking(False)
+    return a, b
+
+class TestTransfer(unittest.TestCase):
+    def setUp(self):
+        self.file = tempfile.TemporaryFile()
+        self.file.write(DATA)
+        self.file.flush()
+
+    def tearDown(self):
+        self.file.close()
+
+    def check_file_sender(self, use_sendfile, offset=0, count=None):
+        evs = EventSet()
+        r, w = nonblocking_pair()
+        collector = Collector()
+        sender = FileSender(self.file, offset, count, use_sendfile)
+        evs.on_writable(w, sender.writer)
+        evs.on_readable(r, collector.reader)
+        evs.run_forever()
+        end = None if count is None else offset + count
+        assert collector.buffer == DATA[offset:end]
+
+    @unittest.skipUnless(HAVE_SENDFILE, 'no os.sendfile')
+    def test_sendfile(self):
+        self.check_file_sender(True)
+        self.check_file_sender(True, 12345, 1024 * 1024)
+        self.check_file_sender(True, len(DATA) + 10)
+
+    def test_mmap(self):
+        self.check_file_sender(False)
+        self.check_file_sender(False, 12345, 1024 * 1024)
+        self.check_file_sender(False, len(DATA) + 10)
+
+    def check_hang_up(self, use_sendfile):
+        evs = EventSet()
+        r, w = nonblocking_pair()
+        quitter = Quitter()
+        sender = FileSender(self.file, use_sendfile=use_sendfile)
+        evs.on_writable(w, sender.writer)
+        evs.on_readable(r, quitter.reader)
+        evs.run_forever()
+        assert DATA.startswith(quitter.buffer)
+        assert len(quitter.buffer) < len(DATA)
+        assert r.fileno() == -1
+        assert w.fileno() == -1
+
+    @unittest.skipUnless(HAVE_SENDFILE, 'no os.sendfile')
+    def test_hang_up_sendfile(self):
+        self.check_hang_up(True)
+
+    def test_hang_up_mmap(self):
+        self.check_hang_up(False)
+
+    def check_proxy(self, use_splice):
+        evs = EventSet()
+        a_in, a_out = nonblocking_pair()
+        b_in, b_out = nonblocking_pair()
+        collector = Collector()
+        evs.on_writable(a_in, FileSender(self.file).writer)
+        proxy(evs, a_out, b_in, use_splice)
+        evs.on_readable(b_out, collector.reader)
+        evs.run_forever()
+        assert collector.buffer == DATA
+
+    @unittest.skipUnless(HAVE_SPLICE, 'no os.splice')
+    def test_proxy_splice(self):
+        self.check_proxy(True)
+
+    def test_proxy_copy(self):
+        self.check_proxy(False)
+
+    def check_slow_dst(self, use_splice, segment=len(DATA)):
+        evs = EventSet()
+        a_in, a_out = nonblocking_pair()
+        b_in, b_out = nonblocking_pair()
+        # so that b can't swallow everything a has
+        b_in.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        b_out.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sent = bytearray()
+        try:
+            while True:
+                n = a_in.send(DATA[len(sent):len(sent) + segment])
+                sent += DATA[len(sent):len(sent) + n]
+        except BlockingIOError:
+            pass
+        a_in.shutdown(socket.SHUT_WR)
+        pump = CountingPump(a_out, b_in, use_splice)
+        pump.calls = 0
+        pump.start(evs)
+        # nobody reads b_out yet, so the pump must stop reading a_out
+        for _ in range(1000):
+            evs.poll_timers()
+            evs.poll_fds(datetime.timedelta(0))
+        assert pump.calls < 100
+
+        collector = Collector()
+        evs.on_readable(b_out, collector.reader)
+        evs.run_forever()
+        assert collector.buffer == sent
+        for s in (a_in, a_out, b_in):
+            s.close()
+
+    @unittest.skipUnless(HAVE_SPLICE, 'no os.splice')
+    def test_slow_dst_splice(self):
+        self.check_slow_dst(True)
+        # each segment takes a whole pipe buffer, so the pipe fills up
+        # long before TRANSFER_SIZE bytes are queued
+        self.check_slow_dst(True, 100)
+
+    def test_slow_dst_copy(self):
+        self.check_slow_dst(False)
+        self.check_slow_dst(False, 100)
+
+    def check_half_close(self, use_splice):
+        evs = EventSet()
+        client, p1 = nonblocking_pair()
+        p2, backend = nonblocking_pair()
+        request = b'GET / HTTP/1.0\r\n\r\n'
+        response = b'HTTP/1.0 200 OK\r\n\r\nHello, world!\n'
+        client.sendall(request)
+        client.shutdown(socket.SHUT_WR)
+        server = Server(response)
+        collector = Collector()
+        evs.on_readable(backend, server.reader)
+        evs.on_readable(client, collector.reader)
+        proxy(evs, p1, p2, use_splice)
+        evs.run_forever()
+        assert server.buffer == request
+        assert collector.buffer == response
+        assert p1.fileno() == -1
+        assert p2.fileno() == -1
+
+    @unittest.skipUnless(HAVE_SPLICE, 'no os.splice')
+    def test_half_close_splice(self):
+        self.check_half_close(True)
+
+    def test_half_close_copy(self):
+        self.check_half_close(False)
+
+    def check_reset(self, use_splice):
+        evs = EventSet()
+        client, p1 = nonblocking_pair()
+        p2, backend = tcp_pair()
+        # make close() send a RST
+        backend.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                struct.pack('ii', 1, 0))
+        backend.close()
+        client.sendall(b'Nobody will ever read this.\n')
+        client.shutdown(socket.SHUT_WR)
+        collector = Collector()
+        evs.on_readable(client, collector.reader)
+        proxy(evs, p1, p2, use_splice)
+        evs.run_forever()
+        assert collector.buffer == b''
+
+    @unittest.skipUnless(HAVE_SPLICE, 'no os.splice')
+    def test_reset_splice(self):
+        self.check_reset(True)
+
+    def test_reset_copy(self):
+        self.check_reset(False)
+
+if __name__ == '__main__':
+    unittest.main()
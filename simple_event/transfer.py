@@ -0,0 +1,254 @@
+# Copyright © 2013, Ben Longbons <b.r.longbons@gmail.com>
+
+# Permission to use, copy, modify, and/or distribute this software for any
+# purpose with or without fee is hereby granted, provided that the above
+# copyright notice and this permission notice appear in all copies.
+
+# THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+# WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+# MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+# ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+# WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+# ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+# OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+
+''' Move bytes into sockets without dragging them through python.
+
+    FileSender goes file-to-socket with os.sendfile(), and Pump goes
+    socket-to-socket with os.splice() through a pipe. Where those are not
+    available, they fall back to mmap and a plain read/write copy.
+'''
+
+import errno
+import mmap
+import os
+import socket
+
+from .sock_ev import fileno
+from . import constants
+
+HAVE_SENDFILE = hasattr(os, 'sendfile')
+HAVE_SPLICE = hasattr(os, 'splice')
+
+# the peer is gone, which ends the transfer just like EOF
+GONE = (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
+
+class FileSender:
+    ''' Send (part of) a file to a socket, when the socket is writable.
+
+        Usage: evs.on_writable(sock, FileSender(f).writer)
+
+        Like any writer, returning CALLBACK_REMOVE at the end will close
+        the socket unless it is also registered for reading.
+    '''
+    __slots__ = ('_in', '_offset', '_count', '_map')
+
+    def __init__(self, file, offset=0, count=None, use_sendfile=HAVE_SENDFILE):
+        ''' file is a file object or an fd, which is NOT closed.
+            count defaults to the rest of the file.
+        '''
+        self._in = fileno(file)
+        if count is None:
+            count = max(0, os.fstat(self._in).st_size - offset)
+        self._offset = offset
+        self._count = count
+        self._map = None
+        if not use_sendfile and count:
+            self._map = mmap.mmap(self._in, 0, access=mmap.ACCESS_READ)
+
+    def _send(self, out):
+        if self._map is None:
+            return os.sendfile(out, self._in, self._offset, self._count)
+        with memoryview(self._map) as view:
+            with view[self._offset:self._offset + self._count] as chunk:
+                return os.write(out, chunk)
+
+    def _close(self):
+        self._count = 0
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def writer(self, evs, fd):
+        out = fileno(fd)
+        while self._count:
+            try:
+                n = self._send(out)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return constants.CALLBACK_PRESERVE
+                self._close()
+                if e.errno in GONE:
+                    return constants.CALLBACK_REMOVE
+                raise
+            if not n: # file got truncated under us
+                break
+            self._offset += n
+            self._count -= n
+        self._close()
+        return constants.CALLBACK_REMOVE
+
+class Pump:
+    ''' Move everything readable from one socket into another.
+
+        Usage:
+            Pump(src, dst).start(evs)
+
+        Once src reaches EOF (or is reset) and everything has been
+        written, dst is shut down for writing and done() is called.
+        If dst is reset, whatever is still queued for it is dropped.
+
+        The pump only registers dup()s of src and dst, since it has to
+        stop reading while dst is slow, and the EventSet would close the
+        real sockets. Closing those is up to the caller - see proxy(),
+        which pumps in both directions.
+    '''
+    __slots__ = ('_src', '_dst', '_done', '_pipe', '_pending', '_buffer',
+            '_eof', '_reading', '_writing')
+
+    def __init__(self, src, dst, use_splice=HAVE_SPLICE, done=None):
+        self._src = src
+        self._dst = dst
+        self._done = done
+        self._eof = False
+        self._reading = None
+        self._writing = None
+        if use_splice:
+            self._pipe = os.pipe()
+            for p in self._pipe:
+                os.set_blocking(p, False)
+            self._pending = 0
+            self._buffer = None
+        else:
+            self._pipe = None
+            self._pending = None
+            self._buffer = bytearray()
+
+    def start(self, evs):
+        self._reading = os.dup(fileno(self._src))
+        evs.on_readable(self._reading, self.reader)
+
+    def _queued(self):
+        if self._buffer is not None:
+            return len(self._buffer)
+        return self._pending
+
+    def _fill(self, src):
+        ''' Read as much as there is room for, returning how much that was.
+        '''
+        n = constants.TRANSFER_SIZE - self._queued()
+        if self._buffer is not None:
+            buf = os.read(src, n)
+            self._buffer += buf
+            return len(buf)
+        n = os.splice(src, self._pipe[1], n,
+                flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+        self._pending += n
+        return n
+
+    def _drain(self, dst):
+        if self._buffer is not None:
+            n = os.write(dst, self._buffer)
+            del self._buffer[:n]
+        else:
+            n = os.splice(self._pipe[0], dst, self._pending,
+                    flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK)
+            self._pending -= n
+
+    def _flush(self, dst):
+        ''' Write as much as possible, returning False if dst is gone.
+        '''
+        while self._queued():
+            try:
+                self._drain(dst)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                if e.errno in GONE:
+                    return False
+                raise
+        return True
+
+    def _finish(self):
+        if self._pipe is not None:
+            for p in self._pipe:
+                os.close(p)
+            self._pipe = None
+        self._pending = 0
+        self._buffer = None
+        try:
+            self._dst.shutdown(socket.SHUT_WR)
+        except OSError: # the peer may already be gone
+            pass
+        if self._done is not None:
+            self._done()
+
+    def reader(self, evs, fd):
+        # splice() can't say whether src is empty or the pipe is full,
+        # and the pipe fills after 16 segments, not TRANSFER_SIZE bytes
+        full = False
+        while self._queued() < constants.TRANSFER_SIZE:
+            try:
+                n = self._fill(fd)
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    full = self._buffer is None and self._pending > 0
+                    break
+                if e.errno not in GONE:
+                    raise
+                n = 0
+            if not n:
+                self._eof = True
+                break
+
+        if self._writing is None:
+            if not self._flush(fileno(self._dst)):
+                self._reading = None
+                self._finish()
+                return constants.CALLBACK_REMOVE
+            if self._queued():
+                self._writing = os.dup(fileno(self._dst))
+                evs.on_writable(self._writing, self.writer)
+        if self._queued() == constants.TRANSFER_SIZE:
+            full = True
+        if self._eof or (full and self._writing is not None):
+            # done, or dst is slow; the writer will start reading again
+            self._reading = None
+            if self._eof and self._writing is None:
+                self._finish()
+            return constants.CALLBACK_REMOVE
+        return constants.CALLBACK_PRESERVE
+
+    def writer(self, evs, fd):
+        if not self._flush(fd):
+            if self._reading is not None:
+                evs.off_readable(self._reading)
+                self._reading = None
+            self._writing = None
+            self._finish()
+            return constants.CALLBACK_REMOVE
+        if not self._eof and self._reading is None \
+                and self._queued() < constants.TRANSFER_SIZE:
+            self.start(evs)
+        if self._queued():
+            return constants.CALLBACK_PRESERVE
+        self._writing = None
+        if self._eof:
+            self._finish()
+        return constants.CALLBACK_REMOVE
+
+def proxy(evs, a, b, use_splice=HAVE_SPLICE):
+    ''' Forward everything between two connected, nonblocking sockets.
+
+        Each side's EOF is passed on as a shutdown of the other side,
+        and both sockets are closed once both directions are finished.
+    '''
+    left = 2
+    def done():
+        nonlocal left
+        left -= 1
+        if not left:
+            a.close()
+            b.close()
+    Pump(a, b, use_splice, done).start(evs)
+    Pump(b, a, use_splice, done).start(evs)